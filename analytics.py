@@ -1,7 +1,200 @@
+import os
+import glob
+import hashlib
+import functools
+from concurrent.futures import ThreadPoolExecutor
 import streamlit as st
 import pandas as pd
-import plotly.express as px
+import numpy as np
 import plotly.graph_objects as go
+from database import DatabaseManager, MARKS_BY_IA_QUERY
+
+# Parquet spill cache is optional; without pyarrow the loaders just query SQLite
+try:
+    import pyarrow  # noqa: F401
+    PARQUET_AVAILABLE = True
+except ImportError:
+    PARQUET_AVAILABLE = False
+
+# Long-lived worker threads, so each keeps its read-only connection between reruns
+_QUERY_POOL = ThreadPoolExecutor(max_workers=3, thread_name_prefix='analytics')
+
+def _read_sql(db_manager, query, params=()):
+    """Run a query on the calling thread's read-only connection"""
+    conn = db_manager.get_ro_connection()
+    # Build the frame straight from the cursor; read_sql_query's setup
+    # overhead dominates for result sets this small
+    cursor = conn.execute(query, params)
+    columns = [column[0] for column in cursor.description]
+    return pd.DataFrame.from_records(cursor.fetchall(), columns=columns)
+
+def _attendance_summary(raw):
+    """Per-student present/absent counts and attendance percentage, indexed by student id"""
+    ct = pd.crosstab(raw['student_id'], raw['status'])
+    ct = ct.reindex(columns=['Present', 'Absent'], fill_value=0)
+    ct.columns = ['present_count', 'absent_count']
+    ct['total_days'] = ct['present_count'] + ct['absent_count']
+    ct['attendance_percentage'] = (ct['present_count'] * 100.0 / ct['total_days']).round(2)
+    return ct
+
+def paginated_dataframe(df, page_size=50, key=None):
+    """Render a DataFrame one page at a time so large tables are never sent to the browser whole"""
+    if len(df) <= page_size:
+        st.dataframe(df, use_container_width=True)
+        return
+    
+    page_count = (len(df) - 1) // page_size + 1
+    page = st.number_input(
+        f"Page (1-{page_count})",
+        min_value=1,
+        max_value=page_count,
+        value=1,
+        key=key
+    )
+    start = (page - 1) * page_size
+    st.dataframe(df.iloc[start:start + page_size], use_container_width=True)
+    st.caption(f"Showing rows {start + 1}-{min(start + page_size, len(df))} of {len(df)}")
+
+def _histogram_figure(values, title, x_label, bins=20):
+    """Bin on the server and send only the bar heights to the browser"""
+    counts, edges = np.histogram(values, bins=bins)
+    fig = go.Figure(go.Bar(
+        x=(edges[:-1] + edges[1:]) / 2,
+        y=counts,
+        width=np.diff(edges)
+    ))
+    fig.update_layout(
+        title=title,
+        xaxis_title=x_label,
+        yaxis_title='Number of Students',
+        bargap=0
+    )
+    return fig
+
+def _parquet_cache_dir(db_path):
+    """Private cache directory next to the database file (it holds student names and marks)"""
+    cache_dir = os.path.join(os.path.dirname(db_path), '.analytics_cache')
+    os.makedirs(cache_dir, mode=0o700, exist_ok=True)
+    if os.name == 'posix' and os.stat(cache_dir).st_mode & 0o077:
+        # Created by an older version or under a permissive umask
+        os.chmod(cache_dir, 0o700)
+    return cache_dir
+
+def _parquet_cache_path(name, db_name, key):
+    """Parquet path for one loader result; changes whenever the row counts or db files change"""
+    db_path = os.path.abspath(db_name)
+    mtimes = tuple(
+        os.path.getmtime(path) if os.path.exists(path) else 0
+        for path in (db_path, db_path + '-wal')
+    )
+    db_hash = hashlib.md5(db_path.encode()).hexdigest()[:12]
+    key_hash = hashlib.md5(repr((key, mtimes)).encode()).hexdigest()[:12]
+    # String arguments (e.g. the IA type) select a different result, not a newer one
+    label = ''.join(f"{part}_" for part in key if isinstance(part, str))
+    cache_dir = _parquet_cache_dir(db_path)
+    # Stale results share the loader/label pattern whichever database they came from
+    stale_pattern = os.path.join(cache_dir, f"{name}_*_{label}*.parquet")
+    return stale_pattern, os.path.join(cache_dir, f"{name}_{db_hash}_{label}{key_hash}.parquet")
+
+def _parquet_backed(loader):
+    """Persist a loader's DataFrame to Parquet so it survives st.cache_data eviction and restarts"""
+    @functools.wraps(loader)
+    def wrapper(db_manager, *key):
+        # In-memory databases have no file to key the cache on, and don't outlive the process
+        if not PARQUET_AVAILABLE or db_manager.in_memory:
+            return loader(db_manager, *key)
+        
+        try:
+            stale_pattern, cache_path = _parquet_cache_path(loader.__name__, db_manager.db_name, key)
+        except OSError:
+            # No writable cache directory
+            return loader(db_manager, *key)
+        
+        if os.path.exists(cache_path):
+            try:
+                return pd.read_parquet(cache_path, memory_map=True)
+            except Exception:
+                pass
+        
+        df = loader(db_manager, *key)
+        try:
+            # Drop results cached for older versions of the data (or other databases)
+            for stale_path in glob.glob(stale_pattern):
+                os.remove(stale_path)
+            df.to_parquet(cache_path, engine='pyarrow', index=False)
+        except Exception:
+            pass
+        return df
+    return wrapper
+
+# Cached loaders: the roster version and row counts are passed in only to act as cache
+# keys, so a Streamlit rerun reuses the previous DataFrame until the underlying tables
+# change (the roster version also changes when a same-size roster replaces the old one).
+# The DatabaseManager itself is hashed by its database file name (or in-memory URI).
+_HASH_DB_MANAGER = {
+    DatabaseManager: lambda db_manager: db_manager.memory_uri or db_manager.db_name
+}
+
+@st.cache_data(ttl=300, show_spinner=False, hash_funcs=_HASH_DB_MANAGER)
+@_parquet_backed
+def _load_student_summary(db_manager, roster_version, att_count, marks_count):
+    """Every student joined with their attendance summary and IA1/IA2 totals"""
+    # The three reads are independent, so issue them concurrently
+    students_future = _QUERY_POOL.submit(_read_sql, db_manager, "SELECT id, usn, name FROM students")
+    attendance_future = _QUERY_POOL.submit(_read_sql, db_manager, "SELECT student_id, status FROM attendance")
+    marks_future = _QUERY_POOL.submit(_read_sql, db_manager, "SELECT student_id, ia_type, total_marks FROM ia_marks")
+    students_df = students_future.result()
+    attendance = _attendance_summary(attendance_future.result())
+    marks = marks_future.result()
+    
+    ia_totals = marks.pivot(index='student_id', columns='ia_type', values='total_marks')
+    ia_totals = ia_totals.reindex(columns=['IA1', 'IA2'])
+    ia_totals.columns = ['ia1_marks', 'ia2_marks']
+    
+    return (
+        students_df
+        .merge(attendance, left_on='id', right_index=True, how='left')
+        .merge(ia_totals, left_on='id', right_index=True, how='left')
+    )
+
+def _attendance_view(summary):
+    """Students with at least one attendance record, best attendance first"""
+    df = summary[summary['total_days'].notna()]
+    df = df[['usn', 'name', 'present_count', 'absent_count', 'total_days', 'attendance_percentage']]
+    df = df.astype({'present_count': int, 'absent_count': int, 'total_days': int})
+    return df.sort_values('attendance_percentage', ascending=False).reset_index(drop=True)
+
+def _combined_view(summary):
+    """Students with at least one IA recorded, best average first"""
+    has_marks = summary['ia1_marks'].notna() | summary['ia2_marks'].notna()
+    df = summary.loc[has_marks, ['usn', 'name', 'ia1_marks', 'ia2_marks']].copy()
+    df['average_marks'] = (df['ia1_marks'] + df['ia2_marks']) / 2.0
+    return df.sort_values('average_marks', ascending=False).reset_index(drop=True)
+
+def _at_risk_view(summary):
+    """Students with low (or no) attendance or a failing IA score"""
+    attendance_pct = summary['attendance_percentage']
+    ia1, ia2 = summary['ia1_marks'], summary['ia2_marks']
+    at_risk = (attendance_pct < 75) | attendance_pct.isna() | (ia1 < 20) | (ia2 < 20)
+    
+    df = summary.loc[at_risk, ['usn', 'name']].copy()
+    df['attendance_percentage'] = attendance_pct[at_risk].fillna(0)
+    df['ia1_marks'] = ia1[at_risk].fillna(0).astype(int)
+    df['ia2_marks'] = ia2[at_risk].fillna(0).astype(int)
+    df['avg_ia_marks'] = ((ia1 + ia2) / 2.0)[at_risk].fillna(0)
+    return df.sort_values(['avg_ia_marks', 'attendance_percentage']).reset_index(drop=True)
+
+@st.cache_data(ttl=300, show_spinner=False, hash_funcs=_HASH_DB_MANAGER)
+@_parquet_backed
+def _load_ia_df(db_manager, ia_type, roster_version, ia_count):
+    """Question-wise marks for a single IA"""
+    return _read_sql(db_manager, MARKS_BY_IA_QUERY, (ia_type,))
+
+def clear_analytics_cache():
+    """Drop the cached loader results; call after attendance/marks writes, since
+    corrections update rows in place and leave the row counts (the cache keys) unchanged"""
+    _load_student_summary.clear()
+    _load_ia_df.clear()
 
 class AnalyticsDashboard:
     def __init__(self, db_manager):
@@ -10,56 +203,39 @@ class AnalyticsDashboard:
     def display_dashboard(self):
         """Display comprehensive analytics dashboard"""
         
-        # Get data
-        conn = self.db_manager.get_connection()
-        
         # Overall statistics
         st.subheader("📊 Overall Statistics")
         
         col1, col2, col3, col4 = st.columns(4)
         
-        total_students = self.db_manager.get_student_count()
-        total_attendance_records = self.db_manager.get_total_attendance_records()
-        total_marks_records = self.db_manager.get_total_marks_records()
+        counts = self.db_manager.get_counts()
         
-        col1.metric("Total Students", total_students)
-        col2.metric("Attendance Records", total_attendance_records)
-        col3.metric("IA1 Records", len(self.db_manager.get_marks_by_ia('IA1')))
-        col4.metric("IA2 Records", len(self.db_manager.get_marks_by_ia('IA2')))
+        col1.metric("Total Students", counts.students)
+        col2.metric("Attendance Records", counts.attendance)
+        col3.metric("IA1 Records", counts.ia1)
+        col4.metric("IA2 Records", counts.ia2)
         
         st.markdown("---")
         
         # Attendance Analytics
         st.subheader("📅 Attendance Analytics")
         
-        attendance_query = '''
-            SELECT 
-                s.usn,
-                s.name,
-                COUNT(CASE WHEN a.status = 'Present' THEN 1 END) as present_count,
-                COUNT(CASE WHEN a.status = 'Absent' THEN 1 END) as absent_count,
-                COUNT(*) as total_days,
-                ROUND(COUNT(CASE WHEN a.status = 'Present' THEN 1 END) * 100.0 / COUNT(*), 2) as attendance_percentage
-            FROM students s
-            LEFT JOIN attendance a ON s.id = a.student_id
-            GROUP BY s.id
-            HAVING total_days > 0
-            ORDER BY attendance_percentage DESC
-        '''
-        
-        attendance_df = pd.read_sql_query(attendance_query, conn)
+        # One scan of attendance and ia_marks feeds both the attendance and at-risk views
+        roster_version = self.db_manager.get_roster_version()
+        summary = _load_student_summary(
+            self.db_manager, roster_version, counts.attendance, counts.marks
+        )
+        attendance_df = _attendance_view(summary)
         
         if not attendance_df.empty:
             col1, col2 = st.columns(2)
             
             with col1:
                 # Attendance percentage distribution
-                fig_attendance = px.histogram(
-                    attendance_df,
-                    x='attendance_percentage',
-                    nbins=20,
-                    title='Attendance Percentage Distribution',
-                    labels={'attendance_percentage': 'Attendance %', 'count': 'Number of Students'}
+                fig_attendance = _histogram_figure(
+                    attendance_df['attendance_percentage'].to_numpy(),
+                    'Attendance Percentage Distribution',
+                    'Attendance %'
                 )
                 st.plotly_chart(fig_attendance, use_container_width=True)
             
@@ -68,9 +244,9 @@ class AnalyticsDashboard:
                 low_attendance = attendance_df[attendance_df['attendance_percentage'] < 75]
                 st.write("**⚠️ Students with Low Attendance (<75%)**")
                 if not low_attendance.empty:
-                    st.dataframe(
+                    paginated_dataframe(
                         low_attendance[['usn', 'name', 'attendance_percentage']],
-                        use_container_width=True
+                        key='low_attendance_page'
                     )
                 else:
                     st.success("All students have good attendance!")
@@ -85,61 +261,41 @@ class AnalyticsDashboard:
         tab1, tab2, tab3 = st.tabs(["IA1 Analysis", "IA2 Analysis", "Combined Analysis"])
         
         with tab1:
-            self.display_ia_analysis('IA1', conn)
+            self.display_ia_analysis('IA1', counts, roster_version)
         
         with tab2:
-            self.display_ia_analysis('IA2', conn)
+            self.display_ia_analysis('IA2', counts, roster_version)
         
         with tab3:
-            self.display_combined_analysis(conn)
+            self.display_combined_analysis(summary)
         
         st.markdown("---")
         
         # At-risk students
         st.subheader("⚠️ At-Risk Students")
         
-        at_risk_query = '''
-            SELECT 
-                s.usn,
-                s.name,
-                COALESCE(att.attendance_percentage, 0) as attendance_percentage,
-                COALESCE(ia1.total_marks, 0) as ia1_marks,
-                COALESCE(ia2.total_marks, 0) as ia2_marks,
-                COALESCE((ia1.total_marks + ia2.total_marks) / 2.0, 0) as avg_ia_marks
-            FROM students s
-            LEFT JOIN (
-                SELECT 
-                    student_id,
-                    ROUND(COUNT(CASE WHEN status = 'Present' THEN 1 END) * 100.0 / COUNT(*), 2) as attendance_percentage
-                FROM attendance
-                GROUP BY student_id
-            ) att ON s.id = att.student_id
-            LEFT JOIN ia_marks ia1 ON s.id = ia1.student_id AND ia1.ia_type = 'IA1'
-            LEFT JOIN ia_marks ia2 ON s.id = ia2.student_id AND ia2.ia_type = 'IA2'
-            WHERE 
-                (att.attendance_percentage < 75 OR att.attendance_percentage IS NULL)
-                OR (ia1.total_marks < 20 OR ia2.total_marks < 20)
-            ORDER BY avg_ia_marks ASC, attendance_percentage ASC
-        '''
-        
-        at_risk_df = pd.read_sql_query(at_risk_query, conn)
+        at_risk_df = _at_risk_view(summary)
         
         if not at_risk_df.empty:
-            st.dataframe(at_risk_df, use_container_width=True)
+            paginated_dataframe(at_risk_df, key='at_risk_page')
         else:
             st.success("No at-risk students identified!")
-        
-        conn.close()
     
-    def display_ia_analysis(self, ia_type, conn):
+    def display_ia_analysis(self, ia_type, counts, roster_version):
         """Display analysis for specific IA"""
-        marks_records = self.db_manager.get_marks_by_ia(ia_type)
+        # Keyed on this IA's own record count so entering IA2 marks keeps IA1 cached
+        ia_count = counts.ia1 if ia_type == 'IA1' else counts.ia2
+        marks_df = _load_ia_df(self.db_manager, ia_type, roster_version, ia_count)
         
-        if not marks_records:
+        if marks_df.empty:
             st.info(f"No {ia_type} data available yet")
             return
         
-        marks_df = pd.DataFrame(marks_records)
+        # Summary statistics from a single pass over the totals
+        totals = marks_df['Total'].to_numpy()
+        passed = totals >= 20
+        pass_count = int(np.count_nonzero(passed))
+        fail_count = len(totals) - pass_count
         
         col1, col2 = st.columns(2)
         
@@ -148,15 +304,9 @@ class AnalyticsDashboard:
             st.write("**📊 Statistics**")
             stats_col1, stats_col2 = st.columns(2)
             
-            avg_marks = marks_df['Total'].mean()
-            max_marks = marks_df['Total'].max()
-            min_marks = marks_df['Total'].min()
-            pass_count = len(marks_df[marks_df['Total'] >= 20])
-            fail_count = len(marks_df[marks_df['Total'] < 20])
-            
-            stats_col1.metric("Average", f"{avg_marks:.2f}/40")
-            stats_col1.metric("Maximum", f"{max_marks}/40")
-            stats_col1.metric("Minimum", f"{min_marks}/40")
+            stats_col1.metric("Average", f"{totals.mean():.2f}/40")
+            stats_col1.metric("Maximum", f"{totals.max()}/40")
+            stats_col1.metric("Minimum", f"{totals.min()}/40")
             
             stats_col2.metric("Pass (≥20)", pass_count)
             stats_col2.metric("Fail (<20)", fail_count)
@@ -164,31 +314,20 @@ class AnalyticsDashboard:
         
         with col2:
             # Marks distribution
-            fig = px.histogram(
-                marks_df,
-                x='Total',
-                nbins=20,
-                title=f'{ia_type} Marks Distribution',
-                labels={'Total': 'Marks', 'count': 'Number of Students'}
-            )
+            fig = _histogram_figure(totals, f'{ia_type} Marks Distribution', 'Marks')
             st.plotly_chart(fig, use_container_width=True)
         
         # Question-wise analysis
         st.write("**📋 Question-wise Performance**")
         
         question_cols = ['Q1', 'Q2', 'Q3', 'Q4', 'Q5', 'Q6', 'Q7', 'Q8']
-        question_avgs = []
         
-        for q in question_cols:
-            # Get average for students who attempted this question
-            attempted = marks_df[marks_df[q].notna()]
-            if not attempted.empty:
-                avg = attempted[q].mean()
-                question_avgs.append({'Question': q, 'Average': avg, 'Attempted': len(attempted)})
+        # Average and attempt count for every question in one aggregation
+        q_df = marks_df[question_cols].agg(['mean', 'count']).T.reset_index()
+        q_df.columns = ['Question', 'Average', 'Attempted']
+        q_df = q_df[q_df['Attempted'] > 0]
         
-        if question_avgs:
-            q_df = pd.DataFrame(question_avgs)
-            
+        if not q_df.empty:
             fig = go.Figure()
             fig.add_trace(go.Bar(
                 x=q_df['Question'],
@@ -212,34 +351,23 @@ class AnalyticsDashboard:
         
         with col1:
             st.write("**🏆 Top Performers**")
-            top_performers = marks_df.nlargest(5, 'Total')[['USN', 'Name', 'Total']]
+            top_n = min(5, len(totals))
+            top_idx = np.argpartition(totals, -top_n)[-top_n:]
+            top_idx = top_idx[np.argsort(totals[top_idx])[::-1]]
+            top_performers = marks_df.iloc[top_idx][['USN', 'Name', 'Total']]
             st.dataframe(top_performers, use_container_width=True)
         
         with col2:
             st.write("**📉 Students Who Failed**")
-            failed_students = marks_df[marks_df['Total'] < 20][['USN', 'Name', 'Total']]
+            failed_students = marks_df[~passed][['USN', 'Name', 'Total']]
             if not failed_students.empty:
-                st.dataframe(failed_students, use_container_width=True)
+                paginated_dataframe(failed_students, key=f'{ia_type}_failed_page')
             else:
                 st.success("No students failed!")
     
-    def display_combined_analysis(self, conn):
+    def display_combined_analysis(self, summary):
         """Display combined IA1 and IA2 analysis"""
-        combined_query = '''
-            SELECT 
-                s.usn,
-                s.name,
-                ia1.total_marks as ia1_marks,
-                ia2.total_marks as ia2_marks,
-                (ia1.total_marks + ia2.total_marks) / 2.0 as average_marks
-            FROM students s
-            LEFT JOIN ia_marks ia1 ON s.id = ia1.student_id AND ia1.ia_type = 'IA1'
-            LEFT JOIN ia_marks ia2 ON s.id = ia2.student_id AND ia2.ia_type = 'IA2'
-            WHERE ia1.total_marks IS NOT NULL OR ia2.total_marks IS NOT NULL
-            ORDER BY average_marks DESC
-        '''
-        
-        combined_df = pd.read_sql_query(combined_query, conn)
+        combined_df = _combined_view(summary)
         
         if combined_df.empty:
             st.info("No marks data available yet")
@@ -270,19 +398,26 @@ class AnalyticsDashboard:
         with col2:
             # Performance comparison
             if not both_ias.empty:
+                # Large classes switch to WebGL and a numeric axis (USN shown on hover)
+                large_class = len(both_ias) > 200
+                scatter = go.Scattergl if large_class else go.Scatter
+                x_values = np.arange(len(both_ias)) if large_class else both_ias['usn']
+                
                 fig = go.Figure()
                 
-                fig.add_trace(go.Scatter(
-                    x=both_ias['usn'],
+                fig.add_trace(scatter(
+                    x=x_values,
                     y=both_ias['ia1_marks'],
+                    hovertext=both_ias['usn'],
                     mode='lines+markers',
                     name='IA1',
                     line=dict(color='blue')
                 ))
                 
-                fig.add_trace(go.Scatter(
-                    x=both_ias['usn'],
+                fig.add_trace(scatter(
+                    x=x_values,
                     y=both_ias['ia2_marks'],
+                    hovertext=both_ias['usn'],
                     mode='lines+markers',
                     name='IA2',
                     line=dict(color='green')
@@ -290,7 +425,7 @@ class AnalyticsDashboard:
                 
                 fig.update_layout(
                     title='IA1 vs IA2 Performance',
-                    xaxis_title='Student USN',
+                    xaxis_title='Student #' if large_class else 'Student USN',
                     yaxis_title='Marks',
                     hovermode='x unified'
                 )
@@ -299,4 +434,4 @@ class AnalyticsDashboard:
         
         # Detailed table
         st.write("**📋 Detailed Performance Table**")
-        st.dataframe(combined_df, use_container_width=True)
+        paginated_dataframe(combined_df, key='combined_page')
@@ -3,6 +3,7 @@ import pandas as pd
 import sqlite3
 import os
 from datetime import datetime
+from collections import Counter
 import io
 
 # Page configuration
@@ -15,7 +16,7 @@ st.set_page_config(
 # Import custom modules
 from database import DatabaseManager
 from voice_processor import VoiceProcessor
-from analytics import AnalyticsDashboard
+from analytics import AnalyticsDashboard, paginated_dataframe, clear_analytics_cache
 
 # Audio recording
 try:
@@ -39,6 +40,13 @@ if 'students_loaded' not in st.session_state:
 if 'usn_prefix' not in st.session_state:
     st.session_state.usn_prefix = "1GA23CI0"  # Default prefix
 
+@st.cache_data(ttl=60, show_spinner=False)
+def attendance_for_date(_db_manager, date_str, total_count):
+    """Attendance list and Present/Absent counts for one date, cached until the attendance table changes"""
+    records = _db_manager.get_attendance_by_date(date_str)
+    status_counts = Counter(record['Status'] for record in records)
+    return pd.DataFrame(records), status_counts['Present'], status_counts['Absent']
+
 def main():
     st.title("🎓 Voice-Assisted Teacher Workload Management System")
     st.markdown("*Reduce manual data entry with AI-powered voice assistance*")
@@ -116,26 +124,35 @@ def student_upload_page():
     
     if uploaded_file is not None:
         try:
-            df = pd.read_csv(uploaded_file)
+            # Only parse the preview rows on each rerun; the full file is read on load
+            uploaded_file.seek(0)
+            preview_df = pd.read_csv(uploaded_file, nrows=10)
             
             # Validate columns
-            if 'USN' not in df.columns or 'Name' not in df.columns:
+            if 'USN' not in preview_df.columns or 'Name' not in preview_df.columns:
                 st.error("❌ CSV must contain 'USN' and 'Name' columns")
                 return
             
             # Preview data
             st.subheader("Preview of uploaded data:")
-            st.dataframe(df.head(10))
+            st.dataframe(preview_df)
             
-            st.info(f"Total students: {len(df)}")
+            # The real student count is reported by the load (after dedupe), so the
+            # whole upload isn't scanned on every rerun just to count it
+            st.caption("Showing the first 10 rows; the full file is read when you load it.")
             
             if st.button("✅ Load Students into Database", type="primary"):
                 with st.spinner("Loading students..."):
+                    uploaded_file.seek(0)
+                    df = pd.read_csv(uploaded_file, dtype={'USN': 'string', 'Name': 'string'})
                     success, message = st.session_state.db_manager.load_students_from_csv(df)
                     
                     if success:
                         st.success(message)
                         st.session_state.students_loaded = True
+                        # The new roster can have the same row counts as the old one
+                        attendance_for_date.clear()
+                        clear_analytics_cache()
                         st.balloons()
                     else:
                         st.error(message)
@@ -163,6 +180,11 @@ def voice_attendance_page():
     # Date selection
     attendance_date = st.date_input("Select Date", datetime.now())
     
+    attendance_entry_fragment(attendance_date)
+
+@st.fragment
+def attendance_entry_fragment(attendance_date):
+    """Voice/text entry and today's list; reruns on its own so commands skip the full page rerun"""
     col1, col2 = st.columns(2)
     
     with col1:
@@ -174,8 +196,12 @@ def voice_attendance_page():
             audio = audiorecorder("🎙️ Speak Now", "⏹️ Stop Recording")
             
             if len(audio) > 0:
+                # Encode the recording once, as WAV (pydub defaults to mp3): reused for
+                # playback and transcription, which then decodes it in memory without ffmpeg
+                audio_bytes = audio.export(format='wav').read()
+                
                 # Display audio player
-                st.audio(audio.export().read())
+                st.audio(audio_bytes)
                 
                 # Process button for live recording
                 if st.button("🎯 Process Recording", type="primary", key="process_live_attendance"):
@@ -183,9 +209,6 @@ def voice_attendance_page():
                         # Update USN prefix
                         st.session_state.voice_processor.usn_prefix = st.session_state.usn_prefix
                         
-                        # Get audio bytes
-                        audio_bytes = audio.export().read()
-                        
                         # Transcribe
                         transcribed_text = st.session_state.voice_processor.transcribe_audio_bytes(audio_bytes)
                         
@@ -201,7 +224,10 @@ def voice_attendance_page():
                             
                             if result['success']:
                                 st.success(f"✅ {result['message']}")
-                                st.rerun()
+                                # Corrections keep the record count, so drop the cached results explicitly
+                                attendance_for_date.clear()
+                                clear_analytics_cache()
+                                st.rerun(scope='fragment')
                             else:
                                 st.error(f"❌ {result['message']}")
                         else:
@@ -233,6 +259,8 @@ def voice_attendance_page():
                     
                     if result['success']:
                         st.success(f"✅ {result['message']}")
+                        attendance_for_date.clear()
+                        clear_analytics_cache()
                     else:
                         st.error(f"❌ {result['message']}")
             else:
@@ -240,16 +268,15 @@ def voice_attendance_page():
     
     with col2:
         st.subheader("📋 Today's Attendance")
-        attendance_records = st.session_state.db_manager.get_attendance_by_date(str(attendance_date))
+        db_manager = st.session_state.db_manager
+        df_attendance, present_count, absent_count = attendance_for_date(
+            db_manager, str(attendance_date), db_manager.get_total_attendance_records()
+        )
         
-        if attendance_records:
-            df_attendance = pd.DataFrame(attendance_records)
-            st.dataframe(df_attendance, use_container_width=True)
+        if not df_attendance.empty:
+            paginated_dataframe(df_attendance, key='attendance_records_page')
             
             # Quick stats
-            present_count = len(df_attendance[df_attendance['Status'] == 'Present'])
-            absent_count = len(df_attendance[df_attendance['Status'] == 'Absent'])
-            
             metric_col1, metric_col2 = st.columns(2)
             metric_col1.metric("Present", present_count)
             metric_col2.metric("Absent", absent_count)
@@ -276,6 +303,11 @@ def voice_marks_page():
     - One from (Q7 or Q8)
     """)
     
+    marks_entry_fragment()
+
+@st.fragment
+def marks_entry_fragment():
+    """Voice/text entry and the marks list; reruns on its own so commands skip the full page rerun"""
     col1, col2 = st.columns(2)
     
     with col1:
@@ -290,8 +322,12 @@ def voice_marks_page():
             audio = audiorecorder("🎙️ Speak Now", "⏹️ Stop Recording", key="marks_recorder")
             
             if len(audio) > 0:
+                # Encode the recording once, as WAV (pydub defaults to mp3): reused for
+                # playback and transcription, which then decodes it in memory without ffmpeg
+                audio_bytes = audio.export(format='wav').read()
+                
                 # Display audio player
-                st.audio(audio.export().read())
+                st.audio(audio_bytes)
                 
                 # Process button for live recording
                 if st.button("🎯 Process Recording", type="primary", key="process_live_marks"):
@@ -299,9 +335,6 @@ def voice_marks_page():
                         # Update USN prefix
                         st.session_state.voice_processor.usn_prefix = st.session_state.usn_prefix
                         
-                        # Get audio bytes
-                        audio_bytes = audio.export().read()
-                        
                         # Transcribe
                         transcribed_text = st.session_state.voice_processor.transcribe_audio_bytes(audio_bytes)
                         
@@ -317,7 +350,8 @@ def voice_marks_page():
                             
                             if result['success']:
                                 st.success(f"✅ {result['message']}")
-                                st.rerun()
+                                clear_analytics_cache()
+                                st.rerun(scope='fragment')
                             else:
                                 st.error(f"❌ {result['message']}")
                         else:
@@ -349,7 +383,8 @@ def voice_marks_page():
                     
                     if result['success']:
                         st.success(f"✅ {result['message']}")
-                        st.rerun()
+                        clear_analytics_cache()
+                        st.rerun(scope='fragment')
                     else:
                         st.error(f"❌ {result['message']}")
             else:
@@ -357,11 +392,10 @@ def voice_marks_page():
     
     with col2:
         st.subheader(f"📊 {ia_type} Marks Records")
-        marks_records = st.session_state.db_manager.get_marks_by_ia(ia_type)
+        df_marks = st.session_state.db_manager.get_marks_by_ia(ia_type)
         
-        if marks_records:
-            df_marks = pd.DataFrame(marks_records)
-            st.dataframe(df_marks, use_container_width=True)
+        if not df_marks.empty:
+            paginated_dataframe(df_marks, key='marks_records_page')
             
             # Quick stats
             avg_marks = df_marks['Total'].mean()
@@ -419,13 +453,11 @@ def database_management_page():
         st.subheader("Database Information")
         
         if st.session_state.students_loaded:
-            student_count = st.session_state.db_manager.get_student_count()
-            attendance_count = st.session_state.db_manager.get_total_attendance_records()
-            marks_count = st.session_state.db_manager.get_total_marks_records()
+            counts = st.session_state.db_manager.get_counts()
             
-            st.metric("Total Students", student_count)
-            st.metric("Attendance Records", attendance_count)
-            st.metric("Marks Records", marks_count)
+            st.metric("Total Students", counts.students)
+            st.metric("Attendance Records", counts.attendance)
+            st.metric("Marks Records", counts.marks)
         else:
             st.info("No data loaded")
     
@@ -434,6 +466,7 @@ def database_management_page():
         
         if st.button("🗑️ Clear Attendance Data", type="secondary"):
             if st.session_state.db_manager.clear_attendance():
+                attendance_for_date.clear()
                 st.success("Attendance data cleared")
                 st.rerun()
         
@@ -450,6 +483,7 @@ def database_management_page():
         if st.button("💣 RESET DATABASE", type="secondary", disabled=(confirm_text != "DELETE")):
             if confirm_text == "DELETE":
                 if st.session_state.db_manager.reset_database():
+                    attendance_for_date.clear()
                     st.success("Database completely reset")
                     st.session_state.students_loaded = False
                     st.rerun()
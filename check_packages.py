@@ -2,40 +2,33 @@
 """Check which packages are installed and working"""
 
 import sys
+import importlib.util
 
 print("Checking installed packages...\n")
 
 packages = {
     'streamlit': 'streamlit',
     'pandas': 'pandas',
-    'whisper': 'whisper',
+    'faster-whisper': 'faster_whisper',
     'rapidfuzz': 'rapidfuzz',
     'openpyxl': 'openpyxl',
     'plotly': 'plotly',
     'soundfile': 'soundfile',
 }
 
-# Check audiorecorder with multiple import methods
-audiorecorder_works = False
-try:
-    from audiorecorder import audiorecorder
+# Check audiorecorder (installed by the streamlit-audiorecorder package)
+audiorecorder_works = importlib.util.find_spec('audiorecorder') is not None
+if audiorecorder_works:
     print("✓ audiorecorder (via streamlit_audiorecorder)")
-    audiorecorder_works = True
-except:
-    try:
-        from audiorecorder import audiorecorder
-        print("✓ audiorecorder (via audiorecorder)")
-        audiorecorder_works = True
-    except:
-        print("✗ audiorecorder - INSTALL: pip install streamlit-audiorecorder")
+else:
+    print("✗ audiorecorder - INSTALL: pip install streamlit-audiorecorder")
 
-# Check other packages
+# Check other packages (find_spec locates them without importing, so torch is never loaded)
 for name, module in packages.items():
-    try:
-        __import__(module)
+    if importlib.util.find_spec(module) is not None:
         print(f"✓ {name}")
-    except ImportError:
-        print(f"✗ {name} - INSTALL: pip install {name if name != 'whisper' else 'openai-whisper'}")
+    else:
+        print(f"✗ {name} - INSTALL: pip install {name}")
 
 print("\n" + "="*50)
 if audiorecorder_works:
@@ -43,5 +36,5 @@ if audiorecorder_works:
     print("Run: streamlit run app.py")
 else:
     print("Missing packages detected!")
-    print("Run: pip install streamlit-audiorecorder openai-whisper")
+    print("Run: pip install streamlit-audiorecorder faster-whisper")
 print("="*50)
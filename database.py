@@ -1,17 +1,165 @@
+import os
+import pathlib
 import sqlite3
+import threading
+import itertools
+import time
+import uuid
+import numpy as np
 import pandas as pd
+from rapidfuzz import fuzz, process
 from datetime import datetime
+from collections import namedtuple
+from functools import lru_cache, wraps
 import io
 
+# Fuzzy student lookup: minimum WRatio score, shortest identifier worth matching, and how
+# far the best student must score above the next one (closer than that is ambiguous)
+FUZZY_SCORE_CUTOFF = 70
+FUZZY_MIN_LENGTH = 3
+FUZZY_TIE_MARGIN = 10
+
+DashboardCounts = namedtuple(
+    'DashboardCounts',
+    ['students', 'attendance', 'marks', 'ia1', 'ia2']
+)
+
+# Student columns as loaded (excludes the generated usn_lc/name_lc lookup columns)
+STUDENT_COLUMNS = "id, usn, name, created_at"
+
+ATTENDANCE_UPSERT = '''
+    INSERT INTO attendance (student_id, date, status)
+    VALUES (?, ?, ?)
+    ON CONFLICT(student_id, date) DO UPDATE SET
+        status = excluded.status,
+        recorded_at = CURRENT_TIMESTAMP
+'''
+
+ATTENDANCE_BY_DATE_QUERY = '''
+    SELECT s.usn as USN, s.name as Name, a.status as Status
+    FROM attendance a
+    JOIN students s ON a.student_id = s.id
+    WHERE a.date = ?
+    ORDER BY s.usn
+'''
+
+MARKS_BY_IA_QUERY = '''
+    SELECT 
+        s.usn as USN, 
+        s.name as Name,
+        m.q1_marks as Q1, m.q2_marks as Q2,
+        m.q3_marks as Q3, m.q4_marks as Q4,
+        m.q5_marks as Q5, m.q6_marks as Q6,
+        m.q7_marks as Q7, m.q8_marks as Q8,
+        m.total_marks as Total
+    FROM ia_marks m
+    JOIN students s ON m.student_id = s.id
+    WHERE m.ia_type = ?
+    ORDER BY s.usn
+'''
+
+# Question pairs of which exactly one must be answered
+QUESTION_PAIRS = ((1, 2), (3, 4), (5, 6), (7, 8))
+
+@lru_cache(maxsize=None)
+def _valid_question_set(questions):
+    """Check a frozenset of question numbers against the IA rules (one from each pair)"""
+    return len(questions) == 4 and all(len(questions & set(pair)) == 1 for pair in QUESTION_PAIRS)
+
+# Roster generation per database, bumped by whichever manager in this process reloads or
+# resets the roster, so lookup caches can check for changes without querying SQLite
+_ROSTER_VERSIONS = {}
+_ROSTER_COUNTER = itertools.count(1)
+
+def _serialized(method):
+    """Run a write under the manager's lock, so transactions on the shared connection don't interleave"""
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._lock:
+            return method(self, *args, **kwargs)
+    return wrapper
+
 class DatabaseManager:
     def __init__(self, db_name="teacher_workload.db"):
         self.db_name = db_name
+        # ":memory:" becomes a named shared-cache database so every connection
+        # (the shared one and the read-only ones alike) sees the same data
+        self.in_memory = db_name == ":memory:"
+        self.memory_uri = (
+            f"file:teacher_workload_{uuid.uuid4().hex}?mode=memory&cache=shared"
+            if self.in_memory else None
+        )
+        # One read-write connection for the manager's lifetime: Streamlit runs each
+        # rerun on a new thread, so a per-thread connection would be rebuilt every time
+        self._conn = None
+        self._lock = threading.RLock()
+        self._ro_local = threading.local()
+        # Fuzzy-search corpus: parallel tuples of lowercased keys and student rows
+        self._fuzz_keys = None
+        self._fuzz_values = None
+        self._fuzz_version = None
+        self._counts_cache = None
+        self._roster_key = self.memory_uri or os.path.abspath(db_name)
         self.init_database()
     
     def get_connection(self):
-        """Create database connection"""
-        return sqlite3.connect(self.db_name)
+        """Get the database connection (shared by every thread, opened once and kept open)"""
+        if self._conn is not None:
+            return self._conn
+        
+        with self._lock:
+            if self._conn is not None:
+                return self._conn
+            # Autocommit mode; multi-statement writes use explicit BEGIN/COMMIT.
+            # A larger statement cache keeps the hot INSERT/SELECT plans prepared.
+            conn = sqlite3.connect(
+                self.memory_uri if self.in_memory else self.db_name,
+                uri=self.in_memory, check_same_thread=False, isolation_level=None,
+                cached_statements=256
+            )
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA cache_size=-20000")
+            conn.execute("PRAGMA temp_store=MEMORY")
+            conn.execute("PRAGMA busy_timeout=5000")
+            self._conn = conn
+        return conn
+    
+    def get_ro_connection(self):
+        """Get the read-only connection used for analytics (one per thread, kept open)"""
+        conn = getattr(self._ro_local, 'conn', None)
+        if conn is None:
+            if self.in_memory:
+                conn = sqlite3.connect(self.memory_uri, uri=True)
+                conn.execute("PRAGMA query_only=ON")
+            else:
+                # Percent-encoded, so paths containing ?, # or % open the right file
+                db_uri = pathlib.Path(self.db_name).resolve().as_uri()
+                conn = sqlite3.connect(f"{db_uri}?mode=ro", uri=True)
+            conn.execute("PRAGMA temp_store=MEMORY")
+            conn.execute("PRAGMA mmap_size=268435456")
+            conn.execute("PRAGMA cache_size=-65536")
+            self._ro_local.conn = conn
+        return conn
+    
+    def close(self):
+        """Close the shared connection and this thread's read-only connection"""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+        conn = getattr(self._ro_local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._ro_local.conn = None
+    
+    def _rollback(self):
+        """Roll back a failed explicit transaction so the shared connection stays usable"""
+        conn = self.get_connection()
+        if conn.in_transaction:
+            conn.rollback()
     
+    @_serialized
     def init_database(self):
         """Initialize database with required tables"""
         conn = self.get_connection()
@@ -23,10 +171,22 @@ class DatabaseManager:
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 usn TEXT UNIQUE NOT NULL,
                 name TEXT NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                usn_lc TEXT GENERATED ALWAYS AS (lower(usn)) VIRTUAL,
+                name_lc TEXT GENERATED ALWAYS AS (lower(name)) VIRTUAL
             )
         ''')
         
+        # Databases created before the lowercase lookup columns existed get them added
+        # (VIRTUAL so ALTER TABLE can add them; the indexes below store the values)
+        student_columns = {row[1] for row in cursor.execute("PRAGMA table_xinfo(students)")}
+        for column, source in (('usn_lc', 'usn'), ('name_lc', 'name')):
+            if column not in student_columns:
+                cursor.execute(
+                    f"ALTER TABLE students ADD COLUMN {column} TEXT "
+                    f"GENERATED ALWAYS AS (lower({source})) VIRTUAL"
+                )
+        
         # Attendance table
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS attendance (
@@ -61,37 +221,62 @@ class DatabaseManager:
             )
         ''')
         
-        conn.commit()
-        conn.close()
+        # Covering index for the per-student attendance aggregation
+        # (ia_marks is already covered by its UNIQUE(student_id, ia_type) index)
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_att_student_status ON attendance(student_id, status)"
+        )
+        
+        # Lookup indexes for per-date/per-IA listings and case-insensitive student search
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_att_date ON attendance(date)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_marks_type ON ia_marks(ia_type)")
+        cursor.execute("DROP INDEX IF EXISTS idx_students_usn_lower")
+        cursor.execute("DROP INDEX IF EXISTS idx_students_name_lower")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_students_usn_lc ON students(usn_lc)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_students_name_lc ON students(name_lc)")
     
+    @_serialized
     def load_students_from_csv(self, df):
         """Load students from pandas DataFrame"""
         try:
             conn = self.get_connection()
             cursor = conn.cursor()
             
-            # Clear existing students
-            cursor.execute("DELETE FROM students")
+            # Normalise and dedupe in pandas so UNIQUE(usn) never aborts the load
+            df = df.assign(
+                USN=df['USN'].fillna('').astype(str).str.strip().str.upper(),
+                Name=df['Name'].fillna('').astype(str).str.strip()
+            )
+            total_rows = len(df)
+            df = df[df['USN'].str.len() > 0]
+            blank_count = total_rows - len(df)
+            df = df.drop_duplicates('USN')
+            duplicate_count = total_rows - blank_count - len(df)
             
-            # Insert new students
-            for _, row in df.iterrows():
-                cursor.execute(
-                    "INSERT INTO students (usn, name) VALUES (?, ?)",
-                    (str(row['USN']).strip(), str(row['Name']).strip())
-                )
+            rows = list(zip(df['USN'], df['Name']))
             
+            # Replace the roster in a single transaction
+            cursor.execute("BEGIN")
+            cursor.execute("DELETE FROM students")
+            cursor.executemany("INSERT INTO students (usn, name) VALUES (?, ?)", rows)
             conn.commit()
-            conn.close()
-            return True, f"Successfully loaded {len(df)} students"
+            self._roster_changed()
+            
+            message = f"Successfully loaded {len(df)} students"
+            if duplicate_count:
+                message += f" (skipped {duplicate_count} duplicate USNs)"
+            if blank_count:
+                message += f" (skipped {blank_count} rows without a USN)"
+            return True, message
         
         except Exception as e:
+            self._rollback()
             return False, f"Error loading students: {str(e)}"
     
     def get_all_students(self):
         """Get all students from database"""
         conn = self.get_connection()
-        df = pd.read_sql_query("SELECT * FROM students", conn)
-        conn.close()
+        df = pd.read_sql_query(f"SELECT {STUDENT_COLUMNS} FROM students", conn)
         return df
     
     def find_student_by_identifier(self, identifier):
@@ -99,74 +284,143 @@ class DatabaseManager:
         conn = self.get_connection()
         cursor = conn.cursor()
         
-        # Try exact USN match first
-        cursor.execute("SELECT * FROM students WHERE LOWER(usn) = LOWER(?)", (identifier,))
-        result = cursor.fetchone()
+        # Exact USN or name match in one query, preferring a USN match
+        identifier_lc = identifier.lower()
+        cursor.execute(
+            f"SELECT {STUDENT_COLUMNS} FROM students WHERE usn_lc = ? OR name_lc = ? "
+            "ORDER BY usn_lc = ? DESC LIMIT 1",
+            (identifier_lc, identifier_lc, identifier_lc)
+        )
+        return cursor.fetchone()
+    
+    def fuzzy_find_student(self, identifier):
+        """Find student using fuzzy matching"""
+        keys, values = self._get_student_corpus()
         
-        if result:
-            conn.close()
-            return result
+        if not keys or len(identifier.strip()) < FUZZY_MIN_LENGTH:
+            return None
         
-        # Try exact name match
-        cursor.execute("SELECT * FROM students WHERE LOWER(name) = LOWER(?)", (identifier,))
-        result = cursor.fetchone()
+        # Find best matches (keys are already lowercased). WRatio also scores partial
+        # matches, so a first name alone ("aloha") finds "aloha smith". A student appears
+        # twice (USN and name), so the top three always include the runner-up student
+        matches = process.extract(
+            identifier.lower(), 
+            keys, 
+            scorer=fuzz.WRatio,
+            processor=None,
+            # Runner-ups down to the tie margin below the cutoff still count as rivals
+            score_cutoff=FUZZY_SCORE_CUTOFF - FUZZY_TIE_MARGIN,
+            limit=3
+        )
         
-        conn.close()
-        return result
+        return self._unambiguous_match([(score, index) for _, score, index in matches], values)
     
-    def fuzzy_find_student(self, identifier):
-        """Find student using fuzzy matching"""
-        from rapidfuzz import fuzz, process
+    def fuzzy_find_students_batch(self, identifiers):
+        """Fuzzy match several identifiers at once; returns one student (or None) per identifier"""
+        keys, values = self._get_student_corpus()
         
-        conn = self.get_connection()
-        cursor = conn.cursor()
+        if not keys or not identifiers:
+            return [None] * len(identifiers)
         
-        cursor.execute("SELECT id, usn, name FROM students")
-        students = cursor.fetchall()
-        conn.close()
+        # One score matrix (identifiers x corpus); scores under the score_cutoff come back as 0
+        scores = process.cdist(
+            [identifier.lower() for identifier in identifiers],
+            keys,
+            scorer=fuzz.WRatio,
+            processor=None,
+            # Runner-ups down to the tie margin below the cutoff still count as rivals
+            score_cutoff=FUZZY_SCORE_CUTOFF - FUZZY_TIE_MARGIN,
+            workers=-1
+        )
+        top = np.argsort(-scores, axis=1, kind='stable')[:, :3]
         
-        if not students:
+        return [
+            self._unambiguous_match(
+                [(scores[row, col], col) for col in top[row] if scores[row, col] > 0], values
+            ) if len(identifier.strip()) >= FUZZY_MIN_LENGTH else None
+            for row, identifier in enumerate(identifiers)
+        ]
+    
+    def _unambiguous_match(self, ranked, values):
+        """Student for the best (score, index) hit, or None if another student scores about as well"""
+        if not ranked:
             return None
         
-        # Create search corpus (both USN and name)
-        choices = {}
-        for student in students:
-            student_id, usn, name = student
-            choices[usn.lower()] = student
-            choices[name.lower()] = student
+        best_score, best_index = ranked[0]
+        if best_score < FUZZY_SCORE_CUTOFF:
+            return None
         
-        # Find best match
-        match = process.extractOne(
-            identifier.lower(), 
-            choices.keys(), 
-            scorer=fuzz.ratio,
-            score_cutoff=70  # Minimum 70% similarity
-        )
+        student = values[best_index]
+        if best_score < 100:
+            for score, index in ranked[1:]:
+                # Partial matches tie easily ("priya" in two names); don't guess between them
+                if values[index][0] != student[0] and best_score - score < FUZZY_TIE_MARGIN:
+                    return None
         
-        if match:
-            return choices[match[0]]
+        return student
+    
+    def get_roster_version(self):
+        """Get a value that changes whenever the student roster is reloaded or reset"""
+        # In-process generation counter: no query, so per-command cache checks are free
+        return _ROSTER_VERSIONS.get(self._roster_key, 0)
+    
+    def _roster_changed(self):
+        """Bump the roster version and drop everything derived from the old roster"""
+        _ROSTER_VERSIONS[self._roster_key] = next(_ROSTER_COUNTER)
+        self._fuzz_keys = None
+        self._counts_cache = None
+    
+    def _get_student_corpus(self):
+        """Get the fuzzy-search corpus, rebuilding it only when the roster changes"""
+        version = self.get_roster_version()
+        
+        if self._fuzz_keys is None or version != self._fuzz_version:
+            students = tuple(self.get_connection().execute("SELECT id, usn, name FROM students").fetchall())
+            
+            # Every USN followed by every name; a match index points straight into _fuzz_values
+            self._fuzz_keys = tuple(
+                [usn.lower() for _, usn, _ in students] + [name.lower() for _, _, name in students]
+            )
+            self._fuzz_values = students + students
+            self._fuzz_version = version
         
-        return None
+        return self._fuzz_keys, self._fuzz_values
     
+    @_serialized
     def record_attendance(self, student_id, date, status):
         """Record or update attendance for a student"""
         try:
             conn = self.get_connection()
             cursor = conn.cursor()
             
-            # Insert or replace (handles corrections automatically)
-            cursor.execute('''
-                INSERT OR REPLACE INTO attendance (student_id, date, status)
-                VALUES (?, ?, ?)
-            ''', (student_id, date, status))
+            # Upsert (handles corrections in place, keeping the row id)
+            cursor.execute(ATTENDANCE_UPSERT, (student_id, date, status))
+            self._counts_cache = None
             
-            conn.commit()
-            conn.close()
             return True, "Attendance recorded successfully"
         
         except Exception as e:
             return False, f"Error recording attendance: {str(e)}"
     
+    @_serialized
+    def record_attendance_batch(self, rows):
+        """Record or update attendance for many (student_id, date, status) rows in one transaction"""
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+            
+            cursor.execute("BEGIN")
+            cursor.executemany(ATTENDANCE_UPSERT, rows)
+            conn.commit()
+            self._counts_cache = None
+            
+            return True, f"Attendance recorded for {len(rows)} students"
+        
+        except Exception as e:
+            self._rollback()
+            return False, f"Error recording attendance: {str(e)}"
+    
+    @_serialized
     def record_ia_marks(self, student_id, ia_type, marks_dict, total):
         """Record or update IA marks for a student"""
         try:
@@ -177,21 +431,27 @@ class DatabaseManager:
             if not self.validate_question_combination(marks_dict):
                 return False, "Invalid question combination. Must select one from each pair: (Q1/Q2), (Q3/Q4), (Q5/Q6), (Q7/Q8)"
             
-            # Insert or replace
+            # Upsert; every question column is overwritten so unanswered ones reset to NULL
             cursor.execute('''
-                INSERT OR REPLACE INTO ia_marks 
+                INSERT INTO ia_marks 
                 (student_id, ia_type, q1_marks, q2_marks, q3_marks, q4_marks, 
                  q5_marks, q6_marks, q7_marks, q8_marks, total_marks)
                 VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(student_id, ia_type) DO UPDATE SET
+                    q1_marks = excluded.q1_marks, q2_marks = excluded.q2_marks,
+                    q3_marks = excluded.q3_marks, q4_marks = excluded.q4_marks,
+                    q5_marks = excluded.q5_marks, q6_marks = excluded.q6_marks,
+                    q7_marks = excluded.q7_marks, q8_marks = excluded.q8_marks,
+                    total_marks = excluded.total_marks,
+                    recorded_at = CURRENT_TIMESTAMP
             ''', (
                 student_id, ia_type,
                 marks_dict.get(1), marks_dict.get(2), marks_dict.get(3), marks_dict.get(4),
                 marks_dict.get(5), marks_dict.get(6), marks_dict.get(7), marks_dict.get(8),
                 total
             ))
+            self._counts_cache = None
             
-            conn.commit()
-            conn.close()
             return True, f"{ia_type} marks recorded successfully"
         
         except Exception as e:
@@ -199,101 +459,87 @@ class DatabaseManager:
     
     def validate_question_combination(self, marks_dict):
         """Validate that question combination follows IA rules"""
-        # Must have exactly 4 questions
-        if len(marks_dict) != 4:
-            return False
-        
-        # Check pairs
-        has_q1_or_q2 = 1 in marks_dict or 2 in marks_dict
-        has_q3_or_q4 = 3 in marks_dict or 4 in marks_dict
-        has_q5_or_q6 = 5 in marks_dict or 6 in marks_dict
-        has_q7_or_q8 = 7 in marks_dict or 8 in marks_dict
-        
-        # Cannot have both from same pair
-        has_both_q1_q2 = 1 in marks_dict and 2 in marks_dict
-        has_both_q3_q4 = 3 in marks_dict and 4 in marks_dict
-        has_both_q5_q6 = 5 in marks_dict and 6 in marks_dict
-        has_both_q7_q8 = 7 in marks_dict and 8 in marks_dict
-        
-        return (has_q1_or_q2 and has_q3_or_q4 and has_q5_or_q6 and has_q7_or_q8 and
-                not has_both_q1_q2 and not has_both_q3_q4 and 
-                not has_both_q5_q6 and not has_both_q7_q8)
+        # Validity depends only on which questions were answered, not the marks
+        return _valid_question_set(frozenset(marks_dict))
+    
+    def _fetch_records(self, query, params=()):
+        """Run a query and return its rows as a list of dicts (no DataFrame round-trip)"""
+        cursor = self.get_connection().cursor()
+        cursor.row_factory = sqlite3.Row
+        cursor.execute(query, params)
+        return [dict(row) for row in cursor.fetchall()]
     
     def get_attendance_by_date(self, date):
         """Get all attendance records for a specific date"""
-        conn = self.get_connection()
-        query = '''
-            SELECT s.usn as USN, s.name as Name, a.status as Status
-            FROM attendance a
-            JOIN students s ON a.student_id = s.id
-            WHERE a.date = ?
-            ORDER BY s.usn
-        '''
-        df = pd.read_sql_query(query, conn, params=(date,))
-        conn.close()
-        return df.to_dict('records') if not df.empty else []
+        return self._fetch_records(ATTENDANCE_BY_DATE_QUERY, (date,))
+    
+    def get_attendance_by_date_df(self, date):
+        """Get all attendance records for a specific date as a DataFrame"""
+        return pd.read_sql_query(ATTENDANCE_BY_DATE_QUERY, self.get_connection(), params=(date,))
     
     def get_marks_by_ia(self, ia_type):
-        """Get all marks for a specific IA"""
-        conn = self.get_connection()
-        query = '''
-            SELECT 
-                s.usn as USN, 
-                s.name as Name,
-                m.q1_marks as Q1, m.q2_marks as Q2,
-                m.q3_marks as Q3, m.q4_marks as Q4,
-                m.q5_marks as Q5, m.q6_marks as Q6,
-                m.q7_marks as Q7, m.q8_marks as Q8,
-                m.total_marks as Total
-            FROM ia_marks m
-            JOIN students s ON m.student_id = s.id
-            WHERE m.ia_type = ?
-            ORDER BY s.usn
-        '''
-        df = pd.read_sql_query(query, conn, params=(ia_type,))
-        conn.close()
-        return df.to_dict('records') if not df.empty else []
+        """Get all marks for a specific IA as a DataFrame"""
+        return pd.read_sql_query(MARKS_BY_IA_QUERY, self.get_connection(), params=(ia_type,))
+    
+    def get_marks_by_ia_records(self, ia_type):
+        """Get all marks for a specific IA as a list of dicts"""
+        return self._fetch_records(MARKS_BY_IA_QUERY, (ia_type,))
+    
+    def get_counts(self):
+        """Get every dashboard record count (a DashboardCounts)
+
+        Memoized for about a second so repeated sidebar/page refreshes reuse
+        the last result; writes through this manager drop the memo.
+        """
+        bucket = int(time.monotonic())
+        if self._counts_cache is not None and self._counts_cache[0] == bucket:
+            return self._counts_cache[1]
+        
+        counts = self.get_dashboard_counts()
+        self._counts_cache = (bucket, counts)
+        return counts
     
     def get_student_count(self):
         """Get total number of students"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT COUNT(*) FROM students")
-        count = cursor.fetchone()[0]
-        conn.close()
-        return count
+        return self.get_counts().students
     
     def get_total_attendance_records(self):
         """Get total attendance records"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT COUNT(*) FROM attendance")
-        count = cursor.fetchone()[0]
-        conn.close()
-        return count
+        return self.get_counts().attendance
     
     def get_total_marks_records(self):
         """Get total marks records"""
+        return self.get_counts().marks
+    
+    def get_dashboard_counts(self):
+        """Get all dashboard record counts in a single query (uncached; see get_counts)"""
         conn = self.get_connection()
         cursor = conn.cursor()
-        cursor.execute("SELECT COUNT(*) FROM ia_marks")
-        count = cursor.fetchone()[0]
-        conn.close()
-        return count
+        cursor.execute('''
+            SELECT
+                (SELECT COUNT(*) FROM students),
+                (SELECT COUNT(*) FROM attendance),
+                (SELECT COUNT(*) FROM ia_marks),
+                (SELECT COUNT(*) FROM ia_marks WHERE ia_type = 'IA1'),
+                (SELECT COUNT(*) FROM ia_marks WHERE ia_type = 'IA2')
+        ''')
+        counts = DashboardCounts(*cursor.fetchone())
+        return counts
     
     def export_to_excel(self, export_type="Complete Report"):
         """Export data to Excel file"""
         try:
             output = io.BytesIO()
+            # One connection for every sheet; each query goes straight to a DataFrame
+            conn = self.get_connection()
             
             with pd.ExcelWriter(output, engine='openpyxl') as writer:
                 # Students sheet
-                students_df = self.get_all_students()
+                students_df = pd.read_sql_query(f"SELECT {STUDENT_COLUMNS} FROM students", conn)
                 students_df.to_excel(writer, sheet_name='Students', index=False)
                 
                 if export_type in ["Complete Report", "Attendance Only"]:
                     # Attendance sheet
-                    conn = self.get_connection()
                     attendance_query = '''
                         SELECT 
                             s.usn as USN,
@@ -306,18 +552,13 @@ class DatabaseManager:
                     '''
                     attendance_df = pd.read_sql_query(attendance_query, conn)
                     attendance_df.to_excel(writer, sheet_name='Attendance', index=False)
-                    conn.close()
                 
                 if export_type in ["Complete Report", "Marks Only"]:
-                    # IA1 Marks sheet
-                    ia1_df = pd.DataFrame(self.get_marks_by_ia('IA1'))
-                    if not ia1_df.empty:
-                        ia1_df.to_excel(writer, sheet_name='IA1_Marks', index=False)
-                    
-                    # IA2 Marks sheet
-                    ia2_df = pd.DataFrame(self.get_marks_by_ia('IA2'))
-                    if not ia2_df.empty:
-                        ia2_df.to_excel(writer, sheet_name='IA2_Marks', index=False)
+                    # IA1 / IA2 Marks sheets
+                    for ia_type in ('IA1', 'IA2'):
+                        marks_df = pd.read_sql_query(MARKS_BY_IA_QUERY, conn, params=(ia_type,))
+                        if not marks_df.empty:
+                            marks_df.to_excel(writer, sheet_name=f'{ia_type}_Marks', index=False)
             
             output.seek(0)
             return output
@@ -326,40 +567,43 @@ class DatabaseManager:
             print(f"Export error: {str(e)}")
             return None
     
+    @_serialized
     def clear_attendance(self):
         """Clear all attendance records"""
         try:
             conn = self.get_connection()
             cursor = conn.cursor()
             cursor.execute("DELETE FROM attendance")
-            conn.commit()
-            conn.close()
+            self._counts_cache = None
             return True
         except:
             return False
     
+    @_serialized
     def clear_marks(self):
         """Clear all marks records"""
         try:
             conn = self.get_connection()
             cursor = conn.cursor()
             cursor.execute("DELETE FROM ia_marks")
-            conn.commit()
-            conn.close()
+            self._counts_cache = None
             return True
         except:
             return False
     
+    @_serialized
     def reset_database(self):
         """Reset entire database"""
         try:
             conn = self.get_connection()
             cursor = conn.cursor()
+            cursor.execute("BEGIN")
             cursor.execute("DELETE FROM students")
             cursor.execute("DELETE FROM attendance")
             cursor.execute("DELETE FROM ia_marks")
             conn.commit()
-            conn.close()
+            self._roster_changed()
             return True
         except:
+            self._rollback()
             return False
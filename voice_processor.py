@@ -1,90 +1,355 @@
 import re
+import io
 import tempfile
 import os
-from rapidfuzz import fuzz, process
+import struct
+import logging
+import threading
 import numpy as np
 
-# Make whisper optional for testing
+logger = logging.getLogger(__name__)
+
+# soundfile decodes recordings in memory; without it audio goes through a temp file
+try:
+    import soundfile as sf
+    SOUNDFILE_AVAILABLE = True
+except (ImportError, OSError):
+    SOUNDFILE_AVAILABLE = False
+
+# soxr (SIMD resampler) brings 44.1/48 kHz recordings down to 16 kHz; numpy interpolation otherwise
 try:
-    import whisper
+    import soxr
+    SOXR_AVAILABLE = True
+except ImportError:
+    SOXR_AVAILABLE = False
+
+# Whisper models expect 16 kHz mono float32 samples
+WHISPER_SAMPLE_RATE = 16000
+
+# Energy-based silence trimming for the openai-whisper fallback (faster-whisper has Silero VAD):
+# 30 ms frames, speech = frames within 35 dB of the loudest, kept with 250 ms padding
+# either side (so pauses shorter than 0.5 s stay in)
+SILENCE_FRAME = WHISPER_SAMPLE_RATE * 30 // 1000
+SILENCE_THRESHOLD_DB = 35.0
+SILENCE_PADDING_FRAMES = 250 // 30
+
+# Whisper model shared by every VoiceProcessor (i.e. every Streamlit session) in the process
+_MODEL = None
+_MODEL_LOCK = threading.Lock()
+
+# Multi-command recordings: a pause this long ends one command, and this many
+# commands are decoded together
+COMMAND_PAUSE_MS = 500
+COMMAND_BATCH_SIZE = 8
+
+# Upper bound on cached student lookups per VoiceProcessor
+STUDENT_CACHE_SIZE = 512
+
+# Make whisper optional for testing. faster-whisper (CTranslate2, int8) is preferred;
+# openai-whisper is still used if it is the only backend installed.
+try:
+    from faster_whisper import WhisperModel, BatchedInferencePipeline, decode_audio
+    from faster_whisper.vad import VadOptions, get_speech_timestamps
+    FASTER_WHISPER_AVAILABLE = True
     WHISPER_AVAILABLE = True
 except ImportError:
-    WHISPER_AVAILABLE = False
-    print("Warning: Whisper not installed. Audio transcription disabled. Text input will still work.")
+    FASTER_WHISPER_AVAILABLE = False
+    try:
+        import whisper
+        WHISPER_AVAILABLE = True
+    except ImportError:
+        WHISPER_AVAILABLE = False
+        logger.warning("Whisper not installed. Audio transcription disabled. Text input will still work.")
+
+# Command-parsing patterns, compiled once at import. Commands are lowercased before
+# parsing, so the patterns are lowercase and case-sensitive (no re.IGNORECASE)
+# extract_identifier
+_USN_RE = re.compile(r'usn\s+(\w+)')
+_STATUS_RE = re.compile(r'^([\w\s]+?)\s+is\s+(present|absent)')
+# (keyword, pattern): the pattern can only match when the keyword is in the text
+_NAME_BEFORE_MARKS_PATTERNS = [(keyword, re.compile(p)) for keyword, p in (
+    ('scored', r'^([\w\s]+?)\s+(?:has\s+)?scored'),  # "aloha scored" or "aloha has scored"
+    ('has', r'^([\w\s]+?)\s+has\s+'),  # "aloha has"
+    ('ia', r'^([\w\s]+?)\s+ia[12]'),  # "aloha ia1"
+)]
+# Words dropped from spoken names, and words that end the name in a command
+_NOISE_WORDS = frozenset({'i', 'scored', 'as', 'a', 'the', 'has', 'have', 'had'})
+_KEYWORDS = frozenset({'is', 'has', 'have', 'scored', 'marks', 'mark', 'ia1', 'ia2', 'question', 'i'})
+# extract_marks: every "question/marks" phrasing in one alternation, scanned once
+_MARKS_RE = re.compile(
+    # "8 marks in question 1" / "scored 1 mark in question 1" (marks first)
+    r'(?P<m1>\d+)\s*marks?\s+in\s+question\s+(?P<q1>\d+)'
+    # "question 1, 8 marks", "question 1 - 8 marks", "question 1 8", "question 1-8"
+    r'|question\s*(?P<q2>\d+)(?:\s*,\s*|[\s\-–—]+)(?P<m2>\d+)(?!\d)'
+    # "q1 8 marks", "q1-8"
+    r'|q(?P<q3>\d+)[\s\-–—]+(?P<m3>\d+)(?!\d)'
+)
+_FLEX_MARKS_RE = re.compile(r'(\d+)[\s\w]*?question\s*(\d+)')
+# fix_transcription_errors: "question 18" with or without a trailing "marks"
+_QFIX_RE = re.compile(r'question\s*(\d{2})(\s*marks?)?(?!\d)')
+
+# Spoken numbers for text_to_number, including every compound spelling
+# ("twenty three", "twenty-three", "twentythree") up to 99
+_ONES = {
+    'one': 1, 'two': 2, 'three': 3, 'four': 4, 'five': 5,
+    'six': 6, 'seven': 7, 'eight': 8, 'nine': 9
+}
+_TENS = {
+    'twenty': 20, 'thirty': 30, 'forty': 40, 'fifty': 50,
+    'sixty': 60, 'seventy': 70, 'eighty': 80, 'ninety': 90
+}
+_NUM_MAP = {
+    'zero': 0, **_ONES,
+    'ten': 10, 'eleven': 11, 'twelve': 12, 'thirteen': 13,
+    'fourteen': 14, 'fifteen': 15, 'sixteen': 16, 'seventeen': 17,
+    'eighteen': 18, 'nineteen': 19, **_TENS,
+    **{
+        f"{tens_word}{separator}{ones_word}": tens + ones
+        for tens_word, tens in _TENS.items()
+        for ones_word, ones in _ONES.items()
+        for separator in (' ', '-', '')
+    }
+}
 
 class VoiceProcessor:
     def __init__(self, db_manager, usn_prefix=""):
         self.db_manager = db_manager
-        self.whisper_model = None
         self.usn_prefix = usn_prefix  # Store USN prefix
+        # Fuzzy lookups by normalized identifier, valid for one roster version
+        self._student_cache = {}
+        self._student_cache_version = None
+    
+    @property
+    def usn_prefix(self):
+        """USN prefix used to expand spoken short USNs"""
+        return self._usn_prefix
+    
+    @usn_prefix.setter
+    def usn_prefix(self, prefix):
+        self._usn_prefix = prefix
+        # Expansion templates, worked out once per prefix instead of on every command.
+        # A prefix ending in 0 drops that 0 for 3-digit USNs (see _expand_usn)
+        prefix = prefix or ""
+        self._prefix_2digit = prefix
+        self._prefix_3digit = prefix[:-1] if prefix.endswith('0') else prefix
     
     def load_whisper_model(self):
-        """Lazy load Whisper model when needed"""
+        """Lazy load Whisper model when needed (once per process, shared by all sessions)"""
+        global _MODEL
         if not WHISPER_AVAILABLE:
             return None
-            
-        if self.whisper_model is None:
-            # Use base model for balance of speed and accuracy
-            self.whisper_model = whisper.load_model("base")
-        return self.whisper_model
+        
+        if _MODEL is None:
+            with _MODEL_LOCK:
+                # Another session may have loaded it while we waited
+                if _MODEL is None:
+                    # Use base model for balance of speed and accuracy
+                    if FASTER_WHISPER_AVAILABLE:
+                        # int8 weights: several times faster than the FP32 PyTorch model
+                        _MODEL = WhisperModel("base", device="auto", compute_type="int8")
+                    else:
+                        _MODEL = whisper.load_model("base")
+        return _MODEL
     
-    def transcribe_audio_bytes(self, audio_bytes):
-        """Transcribe audio from bytes (for live recording)"""
-        if not WHISPER_AVAILABLE:
+    def _run_transcription(self, model, audio):
+        """Transcribe with whichever Whisper backend is loaded and return the text"""
+        # Commands are short utterances: greedy decoding at temperature 0 is as accurate
+        # as beam search here and several times cheaper
+        if FASTER_WHISPER_AVAILABLE:
+            # The VAD filter skips silence so the encoder only sees speech.
+            # Segments are generated lazily; decoding happens while joining
+            segments, _ = model.transcribe(
+                audio,
+                beam_size=1,
+                best_of=1,
+                temperature=0.0,
+                vad_filter=True,
+                vad_parameters=dict(min_silence_duration_ms=500)
+            )
+            return ''.join(segment.text for segment in segments)
+        # openai-whisper already decodes greedily; a single temperature drops the fallback retries
+        if isinstance(audio, np.ndarray):
+            audio = self._trim_silence(audio)
+        return model.transcribe(audio, temperature=0.0)['text']
+    
+    def _trim_silence(self, samples):
+        """Drop silent stretches from 16 kHz samples so Whisper only decodes speech"""
+        frame_count = len(samples) // SILENCE_FRAME
+        if frame_count == 0:
+            return samples
+        
+        # RMS energy per frame (a trailing partial frame follows the last full one)
+        frames = samples[:frame_count * SILENCE_FRAME].reshape(frame_count, SILENCE_FRAME)
+        energy = np.sqrt(np.mean(np.square(frames, dtype=np.float32), axis=1))
+        peak = energy.max()
+        if peak < 1e-4:
+            # Nothing above the noise floor; leave it to Whisper
+            return samples
+        
+        voiced = energy >= peak * 10 ** (-SILENCE_THRESHOLD_DB / 20)
+        # Pad every voiced frame on both sides (bridging short pauses between words)
+        window = np.ones(2 * SILENCE_PADDING_FRAMES + 1)
+        # ('full' and slicing, because 'same' is as long as the window for clips shorter than it)
+        keep = np.convolve(voiced, window)[SILENCE_PADDING_FRAMES:SILENCE_PADDING_FRAMES + frame_count] > 0
+        if keep.all():
+            return samples
+        
+        keep = np.repeat(keep, SILENCE_FRAME)
+        tail = samples[frame_count * SILENCE_FRAME:] if keep[-1] else samples[:0]
+        trimmed = np.concatenate((samples[:len(keep)][keep], tail))
+        logger.debug("Trimmed silence: %d -> %d samples", len(samples), len(trimmed))
+        return trimmed
+    
+    def _read_pcm16_wav(self, audio_bytes):
+        """Read a plain PCM16 WAV straight from its bytes; returns (samples, rate) or None"""
+        if len(audio_bytes) < 12 or audio_bytes[:4] != b'RIFF' or audio_bytes[8:12] != b'WAVE':
             return None
+        
+        # Walk the RIFF chunks: headers are not always 44 bytes (LIST/fact chunks, etc.)
+        fmt = None
+        offset = 12
+        while offset + 8 <= len(audio_bytes):
+            chunk_id = audio_bytes[offset:offset + 4]
+            chunk_size = struct.unpack_from('<I', audio_bytes, offset + 4)[0]
+            body = offset + 8
             
-        try:
-            import soundfile as sf
-            import io
-            
-            # Convert bytes to temporary WAV file
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.wav') as tmp_file:
-                tmp_file.write(audio_bytes)
-                tmp_path = tmp_file.name
-            
-            # Load model and transcribe
-            model = self.load_whisper_model()
-            if model is None:
-                return None
+            if chunk_id == b'fmt ' and body + 16 <= len(audio_bytes):
+                fmt = struct.unpack_from('<HHIIHH', audio_bytes, body)
+            elif chunk_id == b'data':
+                if fmt is None:
+                    return None
+                audio_format, channels, sample_rate, _, _, bits_per_sample = fmt
+                if audio_format != 1 or bits_per_sample != 16 or channels < 1:
+                    # Float, extensible or other sample formats go through soundfile
+                    return None
                 
-            result = model.transcribe(tmp_path)
+                data = audio_bytes[body:body + chunk_size]
+                data = data[:len(data) - len(data) % (2 * channels)]
+                samples = np.frombuffer(data, dtype='<i2').astype(np.float32) * (1.0 / 32768.0)
+                if channels > 1:
+                    samples = samples.reshape(-1, channels)
+                return samples, sample_rate
             
-            # Clean up temp file
-            os.unlink(tmp_path)
-            
-            return result['text']
+            # Chunks are word-aligned
+            offset = body + chunk_size + (chunk_size & 1)
         
-        except Exception as e:
-            print(f"Transcription error: {str(e)}")
+        return None
+    
+    def _decode_audio(self, audio_bytes):
+        """Decode audio bytes in memory to 16 kHz mono float32 samples (None if that isn't possible)"""
+        # PCM16 WAV (what the app exports live recordings as) converts directly from the buffer
+        decoded = self._read_pcm16_wav(audio_bytes)
+        
+        if decoded is not None:
+            data, sample_rate = decoded
+        elif not SOUNDFILE_AVAILABLE:
             return None
+        else:
+            try:
+                data, sample_rate = sf.read(io.BytesIO(audio_bytes), dtype='float32', always_2d=False)
+            except RuntimeError:
+                # Format not supported by libsndfile (e.g. m4a)
+                return None
+        
+        if data.ndim == 2:
+            data = data.mean(axis=1, dtype=np.float32)
+        
+        if sample_rate != WHISPER_SAMPLE_RATE and SOXR_AVAILABLE:
+            data = soxr.resample(data, sample_rate, WHISPER_SAMPLE_RATE, quality='HQ')
+        elif sample_rate != WHISPER_SAMPLE_RATE:
+            # Linear interpolation onto the 16 kHz sample grid
+            target_length = int(round(len(data) * WHISPER_SAMPLE_RATE / sample_rate))
+            data = np.interp(
+                np.linspace(0, len(data) - 1, target_length),
+                np.arange(len(data)),
+                data
+            ).astype(np.float32)
+        
+        return data
     
-    def transcribe_audio(self, audio_file):
-        """Transcribe audio file to text using Whisper"""
+    def transcribe_audio_bytes(self, audio_bytes):
+        """Transcribe audio from bytes (for live recording)"""
+        return self._transcribe_bytes(audio_bytes, self._run_transcription)
+    
+    def transcribe_commands_bytes(self, audio_bytes):
+        """Transcribe a recording of several commands into one text per spoken command"""
+        return self._transcribe_bytes(audio_bytes, self._run_command_transcription)
+    
+    def _transcribe_bytes(self, audio_bytes, run):
+        """Load the model and audio, then transcribe with run(model, audio)"""
         if not WHISPER_AVAILABLE:
             return None
             
         try:
-            # Save uploaded file to temporary location
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.wav') as tmp_file:
-                tmp_file.write(audio_file.read())
-                tmp_path = tmp_file.name
-            
             # Load model and transcribe
             model = self.load_whisper_model()
             if model is None:
                 return None
-                
-            result = model.transcribe(tmp_path)
             
-            # Clean up temp file
-            os.unlink(tmp_path)
+            # Decode in memory and hand Whisper the samples directly
+            audio = self._decode_audio(audio_bytes)
+            if audio is not None:
+                return run(model, audio)
+            
+            # Otherwise let Whisper decode the container itself. faster-whisper (PyAV) reads
+            # file-like objects, so the bytes never touch disk
+            if FASTER_WHISPER_AVAILABLE:
+                return run(model, io.BytesIO(audio_bytes))
+            
+            # openai-whisper shells out to ffmpeg, which needs a real file path
+            with tempfile.NamedTemporaryFile(delete=False, suffix='.wav') as tmp_file:
+                tmp_file.write(audio_bytes)
+                tmp_path = tmp_file.name
             
-            return result['text']
+            try:
+                return run(model, tmp_path)
+            finally:
+                # Clean up temp file
+                os.unlink(tmp_path)
         
         except Exception as e:
-            print(f"Transcription error: {str(e)}")
+            logger.error("Transcription error: %s", e)
             return None
     
+    def _run_command_transcription(self, model, audio):
+        """Transcribe a multi-command recording and return the text of each utterance"""
+        if FASTER_WHISPER_AVAILABLE:
+            if not isinstance(audio, np.ndarray):
+                audio = decode_audio(audio, sampling_rate=WHISPER_SAMPLE_RATE)
+            
+            # Split on pauses with Silero VAD so every command becomes its own clip,
+            # then decode the clips together in batches
+            speech = get_speech_timestamps(audio, VadOptions(
+                min_silence_duration_ms=COMMAND_PAUSE_MS,
+                max_speech_duration_s=30
+            ))
+            if not speech:
+                return []
+            
+            clips = [
+                {'start': ts['start'] / WHISPER_SAMPLE_RATE, 'end': ts['end'] / WHISPER_SAMPLE_RATE}
+                for ts in speech
+            ]
+            segments, _ = BatchedInferencePipeline(model=model).transcribe(
+                audio,
+                clip_timestamps=clips,
+                batch_size=COMMAND_BATCH_SIZE,
+                beam_size=1,
+                best_of=1,
+                temperature=0.0
+            )
+            texts = [segment.text for segment in segments]
+        else:
+            # openai-whisper has no batched decoding; its own segments split the commands
+            segments = model.transcribe(audio, temperature=0.0)['segments']
+            texts = [segment['text'] for segment in segments]
+        
+        return [text.strip() for text in texts if text.strip()]
+    
+    def transcribe_audio(self, audio_file):
+        """Transcribe audio file to text using Whisper"""
+        return self.transcribe_audio_bytes(audio_file.read())
+    
     def process_audio_file(self, audio_file, command_type, date=None, ia_type=None):
         """Process uploaded audio file"""
         # Transcribe audio
@@ -96,6 +361,16 @@ class VoiceProcessor:
         # Process the transcribed text
         return self.process_text_command(transcribed_text, command_type, date, ia_type)
     
+    def process_multi_command_audio(self, audio_file, command_type, date=None, ia_type=None):
+        """Process an uploaded recording holding several commands; returns one result per command"""
+        texts = self.transcribe_commands_bytes(audio_file.read())
+        
+        if texts is None:
+            return [{'success': False, 'message': 'Failed to transcribe audio'}]
+        
+        # One fuzzy match over all the students and, for attendance, one transaction
+        return self.process_text_commands_batch(texts, command_type, date, ia_type)
+    
     def process_text_command(self, text, command_type, date=None, ia_type=None):
         """Process voice command text"""
         if command_type == 'attendance':
@@ -105,28 +380,66 @@ class VoiceProcessor:
         else:
             return {'success': False, 'message': 'Invalid command type'}
     
+    def process_text_commands_batch(self, texts, command_type, date=None, ia_type=None):
+        """Process several voice commands, matching all their students in one fuzzy batch"""
+        if command_type not in ('attendance', 'marks'):
+            return [{'success': False, 'message': 'Invalid command type'} for _ in texts]
+        
+        # Normalize text
+        texts = [text.lower().strip() for text in texts]
+        
+        # Extract every identifier first, then score them all against the roster at once
+        if command_type == 'attendance':
+            identifiers, statuses = zip(*map(self.parse_attendance, texts)) if texts else ((), ())
+        else:
+            identifiers = [self.extract_identifier(text) for text in texts]
+        matches = iter(self.find_students([identifier for identifier in identifiers if identifier]))
+        students = [next(matches) if identifier else None for identifier in identifiers]
+        
+        if command_type == 'marks':
+            return [
+                self._record_marks(text, identifier, student, ia_type)
+                for text, identifier, student in zip(texts, identifiers, students)
+            ]
+        
+        # Attendance: validate each command, then write all valid rows in one transaction
+        results = []
+        pending = []
+        for identifier, status, student in zip(identifiers, statuses, students):
+            error = self._attendance_error(identifier, status, student)
+            if error is None:
+                pending.append((len(results), student, status))
+            results.append(error)
+        
+        if pending:
+            success, message = self.db_manager.record_attendance_batch(
+                [(student[0], date, status) for _, student, status in pending]
+            )
+            for index, (student_id, usn, name), status in pending:
+                if success:
+                    results[index] = {
+                        'success': True,
+                        'message': f'{name} ({usn}) marked {status} for {date}'
+                    }
+                else:
+                    results[index] = {'success': False, 'message': message}
+        
+        return results
+    
     def process_attendance_command(self, text, date):
         """Process attendance voice command"""
         # Normalize text
         text = text.lower().strip()
         
-        # Extract identifier (USN or Name)
-        identifier = self.extract_identifier(text)
-        
-        if not identifier:
-            return {'success': False, 'message': 'Could not identify student from command'}
-        
-        # Extract status
-        status = self.extract_attendance_status(text)
-        
-        if not status:
-            return {'success': False, 'message': 'Could not determine attendance status (Present/Absent)'}
+        # Extract identifier (USN or Name) and status
+        identifier, status = self.parse_attendance(text)
         
         # Find student in database
-        student = self.db_manager.fuzzy_find_student(identifier)
+        student = self.find_student(identifier) if identifier and status else None
         
-        if not student:
-            return {'success': False, 'message': f'Student "{identifier}" not found in database'}
+        error = self._attendance_error(identifier, status, student)
+        if error:
+            return error
         
         student_id, usn, name = student
         
@@ -141,6 +454,19 @@ class VoiceProcessor:
         else:
             return {'success': False, 'message': message}
     
+    def _attendance_error(self, identifier, status, student):
+        """Error result for a parsed attendance command, or None if it can be recorded"""
+        if not identifier:
+            return {'success': False, 'message': 'Could not identify student from command'}
+        
+        if not status:
+            return {'success': False, 'message': 'Could not determine attendance status (Present/Absent)'}
+        
+        if not student:
+            return {'success': False, 'message': f'Student "{identifier}" not found in database'}
+        
+        return None
+    
     def process_marks_command(self, text, ia_type):
         """Process IA marks voice command"""
         # Normalize text
@@ -149,12 +475,16 @@ class VoiceProcessor:
         # Extract identifier
         identifier = self.extract_identifier(text)
         
+        # Find student
+        student = self.find_student(identifier) if identifier else None
+        
+        return self._record_marks(text, identifier, student, ia_type)
+    
+    def _record_marks(self, text, identifier, student, ia_type):
+        """Extract marks from a normalized command and record them for the matched student"""
         if not identifier:
             return {'success': False, 'message': 'Could not identify student from command'}
         
-        # Find student
-        student = self.db_manager.fuzzy_find_student(identifier)
-        
         if not student:
             return {'success': False, 'message': f'Student "{identifier}" not found in database'}
         
@@ -178,7 +508,8 @@ class VoiceProcessor:
         )
         
         if success:
-            questions_str = ', '.join([f'Q{q}={m}' for q, m in sorted(marks_dict.items())])
+            # extract_marks only keeps questions 1-8, so walking that range lists them in order
+            questions_str = ', '.join(f'Q{q}={marks_dict[q]}' for q in range(1, 9) if q in marks_dict)
             return {
                 'success': True,
                 'message': f'{name} ({usn}) - {ia_type}: {questions_str}, Total: {total}/40'
@@ -186,74 +517,115 @@ class VoiceProcessor:
         else:
             return {'success': False, 'message': message}
     
+    def _sync_student_cache(self):
+        """Drop cached lookups if the roster changed (or the cache is full)"""
+        version = self.db_manager.get_roster_version()
+        if version != self._student_cache_version or len(self._student_cache) >= STUDENT_CACHE_SIZE:
+            self.clear_student_cache()
+            self._student_cache_version = version
+    
+    def find_student(self, identifier):
+        """Fuzzy-find a student, reusing earlier results for the same identifier"""
+        self._sync_student_cache()
+        
+        key = identifier.lower().strip()
+        if key not in self._student_cache:
+            self._student_cache[key] = self.db_manager.fuzzy_find_student(identifier)
+        return self._student_cache[key]
+    
+    def find_students(self, identifiers):
+        """Fuzzy-find several students, scoring all uncached identifiers in one batch"""
+        self._sync_student_cache()
+        
+        keys = [identifier.lower().strip() for identifier in identifiers]
+        missing = list(dict.fromkeys(key for key in keys if key not in self._student_cache))
+        if missing:
+            for key, student in zip(missing, self.db_manager.fuzzy_find_students_batch(missing)):
+                self._student_cache[key] = student
+        return [self._student_cache[key] for key in keys]
+    
+    def clear_student_cache(self):
+        """Forget cached student lookups (done automatically when the roster changes)"""
+        self._student_cache.clear()
+    
     def extract_identifier(self, text):
         """Extract student identifier (USN or Name) from text - IMPROVED with USN prefix support"""
-        noise_words = ['i', 'scored', 'as', 'a', 'the', 'has', 'have', 'had']
+        # Dispatch on how the command starts so each case only runs its own checks:
+        # "usn ..." (the usual form), a bare number, or a name
         
         # Pattern 1: USN with optional prefix expansion
         # SMART PADDING: Handles both 2-digit (024) and 3-digit (106) USNs
         # "usn 24" → "1GA23CI024" if prefix is "1GA23CI0"
         # "usn 106" → "1GA23CI106" if prefix is "1GA23CI"
-        usn_pattern = r'usn\s+(\w+)'
-        match = re.search(usn_pattern, text, re.IGNORECASE)
-        if match:
-            usn_part = match.group(1)
-            # If it's just 2-3 digits, prepend the prefix
-            if usn_part.isdigit() and len(usn_part) <= 3 and self.usn_prefix:
-                full_usn = self._expand_usn(usn_part)
-                print(f"🔧 Expanded USN: {usn_part} → {full_usn}")
-                return full_usn
-            return usn_part
+        if text.startswith('usn '):
+            tokens = text[4:].split(None, 1)
+            if tokens and tokens[0].isalnum():
+                return self._usn_identifier(tokens[0])
+        
+        # "usn" later in the command (or followed by punctuation) needs the regex
+        if 'usn' in text:
+            match = _USN_RE.search(text)
+            if match:
+                return self._usn_identifier(match.group(1))
         
         # Pattern 1.5: Just digits at start (common in voice: "24 is present")
         # Only if we have a prefix set
-        if self.usn_prefix:
-            digit_pattern = r'^(\d{2,3})\s+(is|has|scored)'
-            match = re.search(digit_pattern, text, re.IGNORECASE)
-            if match:
-                digits = match.group(1)
+        if self.usn_prefix and text[:1].isdigit():
+            parts = text.split(None, 1)
+            if (len(parts) == 2 and parts[0].isdecimal() and len(parts[0]) in (2, 3)
+                    and parts[1].startswith(('is', 'has', 'scored'))):
+                digits = parts[0]
                 full_usn = self._expand_usn(digits)
-                print(f"🔧 Expanded short USN: {digits} → {full_usn}")
+                logger.debug("Expanded short USN: %s -> %s", digits, full_usn)
                 return full_usn
         
+        return self._extract_name(text)
+    
+    def _usn_identifier(self, usn_part):
+        """Spoken USN as an identifier, expanded with the prefix when it's just 2-3 digits"""
+        if usn_part.isdigit() and len(usn_part) <= 3 and self.usn_prefix:
+            full_usn = self._expand_usn(usn_part)
+            logger.debug("Expanded USN: %s -> %s", usn_part, full_usn)
+            return full_usn
+        return usn_part
+    
+    def _extract_name(self, text):
+        """Extract a spoken student name from a command with no USN"""
+        # Each pattern only runs when its literal keyword is in the text
+        
         # Pattern 2: Name before status word (for attendance)
         # "aloha is present" or "bob johnson is absent"
-        status_pattern = r'^([\w\s]+?)\s+is\s+(present|absent)'
-        match = re.search(status_pattern, text, re.IGNORECASE)
-        if match:
-            name = match.group(1).strip()
-            # Clean noise words
-            name_parts = [w for w in name.split() if w.lower() not in noise_words]
-            return ' '.join(name_parts) if name_parts else name
+        if 'is' in text:
+            match = _STATUS_RE.search(text)
+            if match:
+                name = match.group(1).strip()
+                # Clean noise words
+                name_parts = [w for w in name.split() if w not in _NOISE_WORDS]
+                return ' '.join(name_parts) if name_parts else name
         
         # Pattern 3: For marks - extract name before "scored", "has", or "ia"
         # "aloha has scored" → "aloha"
         # "aloha scored" → "aloha"
-        marks_patterns = [
-            r'^([\w\s]+?)\s+(?:has\s+)?scored',  # "aloha scored" or "aloha has scored"
-            r'^([\w\s]+?)\s+has\s+',  # "aloha has"
-            r'^([\w\s]+?)\s+ia[12]',  # "aloha ia1"
-        ]
-        
-        for pattern in marks_patterns:
-            match = re.search(pattern, text, re.IGNORECASE)
+        for keyword, pattern in _NAME_BEFORE_MARKS_PATTERNS:
+            if keyword not in text:
+                continue
+            match = pattern.search(text)
             if match:
                 name = match.group(1).strip()
                 # Clean noise words
-                name_parts = [w for w in name.split() if w.lower() not in noise_words]
+                name_parts = [w for w in name.split() if w not in _NOISE_WORDS]
                 return ' '.join(name_parts) if name_parts else name
         
         # Pattern 4: Extract first valid name-like word before keywords
-        keywords = ['is', 'has', 'have', 'scored', 'marks', 'mark', 'ia1', 'ia2', 'question', 'i']
         words = text.split()
         
         # Take words before first keyword
         identifier_words = []
         for word in words:
-            if word.lower() in keywords:
+            if word in _KEYWORDS:
                 break
             # Only keep words that are likely names (length > 1, not numbers)
-            if word.lower() not in noise_words and len(word) > 1 and not word.isdigit():
+            if word not in _NOISE_WORDS and len(word) > 1 and not word.isdigit():
                 identifier_words.append(word)
         
         if identifier_words:
@@ -261,6 +633,23 @@ class VoiceProcessor:
         
         return None
     
+    def parse_attendance(self, text):
+        """Extract (identifier, status) from an attendance command in a single pass over its words"""
+        # "<name> is present/absent" is the common form; USN and short-digit commands
+        # (and anything else) go through the full extractors
+        if 'usn' not in text:
+            tokens = text.split()
+            for i, token in enumerate(tokens):
+                if token == 'is' and i + 1 < len(tokens) and tokens[i + 1] in ('present', 'absent'):
+                    words = tokens[:i]
+                    if (not words or (self.usn_prefix and words[0].isdecimal())
+                            or not all(w.replace('_', '').isalnum() for w in words)):
+                        break
+                    name_parts = [w for w in words if w not in _NOISE_WORDS]
+                    return ' '.join(name_parts or words), tokens[i + 1].capitalize()
+        
+        return self.extract_identifier(text), self.extract_attendance_status(text)
+    
     def extract_attendance_status(self, text):
         """Extract attendance status from text"""
         if 'present' in text:
@@ -278,47 +667,18 @@ class VoiceProcessor:
         # "question 37" likely means "question 3, 7 marks"
         text = self.fix_transcription_errors(text)
         
-        # Pattern 1: Various formats for question and marks
-        patterns = [
-            # "question 1, 8 marks" (comma separator - common in voice)
-            r'question\s*(\d+)\s*,\s*(\d+)\s*marks?',
-            # "question 1 8 marks" or "question 1 - 8 marks"
-            r'question\s*(\d+)[\s\-–—]*(\d+)\s*mark',
-            # "question 1 8" or "question 1-8"
-            r'question\s*(\d+)[\s\-–—]+(\d+)(?!\d)',
-            # "q1 8 marks" or "q1-8"
-            r'q(\d+)[\s\-–—]+(\d+)\s*mark',
-            r'q(\d+)[\s\-–—]+(\d+)(?!\d)',
-            # "1 mark in question 1" or "8 marks in question 1"
-            r'(\d+)\s*mark[s]?\s+in\s+question\s+(\d+)',
-            # Natural: "scored 1 mark in question 1"
-            r'scored[\s\w]*?(\d+)\s*mark[s]?\s+in\s+question\s+(\d+)',
-        ]
-        
-        for pattern in patterns:
-            matches = re.finditer(pattern, text, re.IGNORECASE)
-            for match in matches:
-                # Handle different group orders
-                g1, g2 = match.group(1), match.group(2)
-                
-                # Check if it's "marks in question N" format
-                if 'mark' in pattern and 'question' in pattern and pattern.index('question') > pattern.index(r'(\d+)'):
-                    # Marks first, then question number
-                    marks = int(g1)
-                    question_num = int(g2)
-                else:
-                    # Question number first, then marks
-                    question_num = int(g1)
-                    marks = int(g2)
-                
-                if 1 <= question_num <= 8 and 0 <= marks <= 10:
-                    marks_dict[question_num] = marks
+        # Pattern 1: Various formats for question and marks, in a single pass
+        for match in _MARKS_RE.finditer(text):
+            question_num = int(match.group('q1') or match.group('q2') or match.group('q3'))
+            marks = int(match.group('m1') or match.group('m2') or match.group('m3'))
+            
+            if 1 <= question_num <= 8 and 0 <= marks <= 10:
+                marks_dict[question_num] = marks
         
         # If still empty, try more flexible pattern
         if not marks_dict:
             # Look for any numbers followed by "question" followed by number
-            flexible_pattern = r'(\d+)[\s\w]*?question\s*(\d+)'
-            matches = re.finditer(flexible_pattern, text, re.IGNORECASE)
+            matches = _FLEX_MARKS_RE.finditer(text)
             for match in matches:
                 marks = int(match.group(1))
                 question_num = int(match.group(2))
@@ -343,18 +703,13 @@ class VoiceProcessor:
             
             # Valid question numbers are 1-8, valid marks are 0-10
             if 1 <= digit1 <= 8 and 0 <= digit2 <= 10:
-                # Likely "question 1, 8 marks"
-                return f"question {digit1} {digit2} marks"
+                # Likely "question 1, 8 marks"; keep "marks" only if it was spoken
+                return f"question {digit1} {digit2}" + (" marks" if match.group(2) else "")
             
             return full_text
         
-        # Replace "question 18 marks" → "question 1 8 marks"
-        text = re.sub(r'question\s*(\d{2})\s*mark', replace_question_number, text, flags=re.IGNORECASE)
-        
-        # Also handle without "marks" word: "question 18" → "question 1 8"
-        text = re.sub(r'question\s*(\d{2})(?!\d)', replace_question_number, text, flags=re.IGNORECASE)
-        
-        return text
+        # "question 18 marks" → "question 1 8 marks", "question 18" → "question 1 8"
+        return _QFIX_RE.sub(replace_question_number, text)
     
     def _expand_usn(self, digits):
         """
@@ -366,45 +721,16 @@ class VoiceProcessor:
         - Prefix "1GA23CI0", digits "106" → "1GA23CI106" (removes trailing 0)
         - Prefix "1GA23CI", digits "106" → "1GA23CI106"
         """
-        if not self.usn_prefix:
-            return digits
-        
-        # If prefix ends with 0 and we have 3 digits (like 106)
-        # Remove the trailing 0 from prefix
-        if self.usn_prefix.endswith('0') and len(digits) == 3:
-            # Remove trailing 0 for 3-digit USNs
-            return self.usn_prefix[:-1] + digits
-        else:
-            # Just append for 2-digit USNs
-            return self.usn_prefix + digits
+        # No prefix leaves the digits as they are (both templates are empty)
+        return (self._prefix_3digit if len(digits) == 3 else self._prefix_2digit) + digits
     
     def text_to_number(self, text):
         """Convert text numbers to integers"""
-        # Simple conversion for common numbers
-        number_map = {
-            'zero': 0, 'one': 1, 'two': 2, 'three': 3, 'four': 4,
-            'five': 5, 'six': 6, 'seven': 7, 'eight': 8, 'nine': 9,
-            'ten': 10, 'eleven': 11, 'twelve': 12, 'thirteen': 13,
-            'fourteen': 14, 'fifteen': 15, 'sixteen': 16, 'seventeen': 17,
-            'eighteen': 18, 'nineteen': 19, 'twenty': 20,
-            'thirty': 30, 'forty': 40, 'fifty': 50
-        }
-        
         text = text.lower().strip()
         
         # Check if already a number
         if text.isdigit():
             return int(text)
         
-        # Direct mapping
-        if text in number_map:
-            return number_map[text]
-        
-        # Handle compound numbers like "twenty three"
-        words = text.split()
-        if len(words) == 2:
-            tens = number_map.get(words[0], 0)
-            ones = number_map.get(words[1], 0)
-            return tens + ones
-        
-        return None
\ No newline at end of file
+        # Single words and every compound spelling are precomputed in _NUM_MAP
+        return _NUM_MAP.get(text)